@@ -2,12 +2,98 @@
 Easy document management for the Knowledge Graph
 """
 
+from collections import Counter
+from contextlib import ExitStack
 import requests
+from requests_toolbelt.multipart.encoder import MultipartEncoder
 from pathlib import Path
+import hashlib
+import json
+import mmap
 import os
 
+from api_client import make_session
+
 API_BASE = "http://localhost:8000"
 
+SESSION = make_session()
+
+# Upload form field and content type for each supported file suffix
+UPLOAD_TYPES = {
+    '.md': ('markdown_files', 'text/markdown'),
+    '.pdf': ('pdf_files', 'application/pdf'),
+    '.json': ('links_file', 'application/json'),
+}
+
+class MappedUpload:
+    """
+    Read-only, mmap-backed file body for MultipartEncoder
+    
+    The encoder sizes each part from a `len` attribute that must shrink as
+    the body is read, which a bare mmap (constant __len__) does not do.
+    """
+    
+    def __init__(self, fh):
+        self._map = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    
+    @property
+    def len(self) -> int:
+        return len(self._map) - self._map.tell()
+    
+    def read(self, size: int = -1) -> bytes:
+        return self._map.read(size)
+    
+    def close(self):
+        self._map.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+# Local record of file hashes: {path: [mtime_ns, size, sha256]}
+HASH_CACHE_PATH = Path.home() / ".kg_cache.json"
+
+def hash_files(paths):
+    """
+    SHA-256 every file, reusing cached digests for files whose
+    modification time and size are unchanged
+    
+    Args:
+        paths: Files to fingerprint
+        
+    Returns:
+        Set of hex digests, one per distinct file content
+    """
+    try:
+        cache = json.loads(HASH_CACHE_PATH.read_text())
+    except (OSError, ValueError):
+        cache = {}
+    
+    digests = set()
+    for path in paths:
+        key = str(path.resolve())
+        st = path.stat()
+        cached = cache.get(key)
+        if cached and cached[:2] == [st.st_mtime_ns, st.st_size]:
+            digests.add(cached[2])
+            continue
+        
+        # Stream the file in 1 MiB chunks instead of reading it whole
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                sha.update(chunk)
+        cache[key] = [st.st_mtime_ns, st.st_size, sha.hexdigest()]
+        digests.add(cache[key][2])
+    
+    try:
+        HASH_CACHE_PATH.write_text(json.dumps(cache))
+    except OSError:
+        pass  # The cache only saves rehashing; never fail an upload over it
+    return digests
+
 def add_documents_from_folder(folder_path: str = "."):
     """
     Add all documents from a folder to the knowledge graph
@@ -18,14 +104,28 @@ def add_documents_from_folder(folder_path: str = "."):
     print(f"Scanning folder: {folder_path}")
     
     folder = Path(folder_path)
-    if not folder.exists():
+    if not folder.is_dir():
         print(f"ERROR: Folder not found: {folder_path}")
         return False
     
-    # Find all supported files
-    markdown_files = list(folder.glob("*.md"))
-    pdf_files = list(folder.glob("*.pdf"))
-    json_files = list(folder.glob("*links*.json")) + list(folder.glob("*bookmarks*.json"))
+    # Find all supported files in a single pass over the directory
+    found = {suffix: [] for suffix in UPLOAD_TYPES}
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            name = entry.name.lower()
+            suffix = os.path.splitext(name)[1]
+            if suffix not in found:
+                continue
+            # Only JSON files named as link collections are uploaded
+            if suffix == '.json' and not ('links' in name or 'bookmarks' in name):
+                continue
+            found[suffix].append(Path(entry.path))
+    
+    markdown_files = found['.md']
+    pdf_files = found['.pdf']
+    json_files = found['.json']
     
     total_files = len(markdown_files) + len(pdf_files) + len(json_files)
     
@@ -50,31 +150,48 @@ def add_documents_from_folder(folder_path: str = "."):
         for f in json_files:
             print(f"    • {f.name}")
     
-    # Prepare files for upload
-    files = []
-    file_handles = []
-    
     try:
-        # Add markdown files
-        for md_file in markdown_files:
-            fh = open(md_file, 'rb')
-            file_handles.append(fh)
-            files.append(('markdown_files', (md_file.name, fh, 'text/markdown')))
-        
-        # Add PDF files
-        for pdf_file in pdf_files:
-            fh = open(pdf_file, 'rb')
-            file_handles.append(fh)
-            files.append(('pdf_files', (pdf_file.name, fh, 'application/pdf')))
-        
-        # Add JSON files (assume they're link collections)
-        for json_file in json_files:
-            fh = open(json_file, 'rb')
-            file_handles.append(fh)
-            files.append(('links_file', (json_file.name, fh, 'application/json')))
+        # The server rebuilds the graph from each upload, so the folder is only
+        # skipped when the graph was built from exactly these files; an empty
+        # graph can never match, so the files are not hashed in that case
+        response = SESSION.get(f"{API_BASE}/sources")
+        sources = response.json()['sources'] if response.ok else []
+        if sources and set(sources) == hash_files(
+            [path for paths in found.values() for path in paths]
+        ):
+            print("\nSUCCESS: No changes since the last upload, graph is up to date")
+            return True
         
-        print(f"\n Uploading {len(files)} files to knowledge graph...")
-        response = requests.post(f"{API_BASE}/ingest", files=files)
+        # Every opened file and mapping is closed when the upload finishes,
+        # including when opening a later file fails part-way through
+        with ExitStack() as stack:
+            fields = []
+            for suffix, paths in found.items():
+                field, content_type = UPLOAD_TYPES[suffix]
+                for path in paths:
+                    body = fh = stack.enter_context(open(path, 'rb'))
+                    # Serve PDFs straight from the page cache via mmap
+                    # (empty files cannot be mapped)
+                    if suffix == '.pdf' and os.fstat(fh.fileno()).st_size > 0:
+                        body = stack.enter_context(MappedUpload(fh))
+                    fields.append((field, (path.name, body, content_type)))
+            
+            # Stream the multipart body so files are read from disk in chunks
+            # while the request is being written, instead of buffered up front.
+            # The encoder sizes every part up front, so the total is advertised
+            # and the server (or a proxy) can reject oversized uploads early
+            encoder = MultipartEncoder(fields)
+            
+            print(f"\n Uploading {len(fields)} files to knowledge graph...")
+            response = SESSION.post(
+                f"{API_BASE}/ingest",
+                params={'skip_existing': 'true'},
+                data=encoder,
+                headers={
+                    'Content-Type': encoder.content_type,
+                    'Content-Length': str(encoder.len)
+                }
+            )
         
         if response.status_code == 200:
             result = response.json()
@@ -92,10 +209,6 @@ def add_documents_from_folder(folder_path: str = "."):
     except Exception as e:
         print(f"ERROR: Error: {e}")
         return False
-    finally:
-        # Always close file handles
-        for fh in file_handles:
-            fh.close()
 
 def add_single_document(file_path: str):
     """
@@ -114,26 +227,18 @@ def add_single_document(file_path: str):
     # Determine file type
     extension = file_path.suffix.lower()
     
-    if extension == '.md':
-        file_type = 'markdown_files'
-        content_type = 'text/markdown'
-    elif extension == '.pdf':
-        file_type = 'pdf_files'
-        content_type = 'application/pdf'
-    elif extension == '.json':
-        file_type = 'links_file'
-        content_type = 'application/json'
-    else:
+    if extension not in UPLOAD_TYPES:
         print(f"ERROR: Unsupported file type: {extension}")
         print("Supported formats: .md, .pdf, .json")
         return False
+    file_type, content_type = UPLOAD_TYPES[extension]
     
     try:
         with open(file_path, 'rb') as f:
             files = [(file_type, (file_path.name, f, content_type))]
             
             print(f" Uploading {file_path.name}...")
-            response = requests.post(f"{API_BASE}/ingest", files=files)
+            response = SESSION.post(f"{API_BASE}/ingest", files=files)
         
         if response.status_code == 200:
             result = response.json()
@@ -153,9 +258,14 @@ def add_single_document(file_path: str):
         return False
 
 def show_graph_status():
-    """Show current graph status"""
+    """
+    Show current graph status
+    
+    Returns:
+        False if the server could not be reached, True otherwise
+    """
     try:
-        response = requests.get(f"{API_BASE}/graph")
+        response = SESSION.get(f"{API_BASE}/graph")
         if response.status_code == 200:
             graph_data = response.json()
             print(f" Knowledge Graph Status:")
@@ -164,41 +274,30 @@ def show_graph_status():
             
             if graph_data['total_nodes'] > 0:
                 # Count node types
-                node_types = {}
-                for node in graph_data['nodes']:
-                    node_type = node['node_type']
-                    node_types[node_type] = node_types.get(node_type, 0) + 1
+                node_types = Counter(node['node_type'] for node in graph_data['nodes'])
                 
                 print(f"   Node breakdown:")
-                for node_type, count in node_types.items():
-                    emoji = "*" if node_type == 'note' else "*" if node_type == 'pdf' else "*"
-                    print(f"     {emoji} {node_type.title()}: {count}")
+                for node_type, count in node_types.most_common():
+                    print(f"     * {node_type.title()}: {count}")
         else:
             print(" Knowledge Graph: Empty (no data ingested)")
             
     except requests.exceptions.ConnectionError:
         print("ERROR: Could not connect to server. Please start with: py start_server.py")
+        return False
     except Exception as e:
         print(f"ERROR: Error: {e}")
+    return True
 
 def main():
     """Interactive document management"""
     print(" Knowledge Graph Document Manager")
     print("="*50)
     
-    # Check server status
-    try:
-        response = requests.get(f"{API_BASE}/")
-        if response.status_code != 200:
-            raise requests.exceptions.ConnectionError()
-        print("SUCCESS: Server is running")
-    except requests.exceptions.ConnectionError:
-        print("ERROR: Server not running. Please start with: py start_server.py")
+    # Show current status (also tells us whether the server is up)
+    if not show_graph_status():
         return
     
-    # Show current status
-    show_graph_status()
-    
     print(f"\n Quick Actions:")
     print(f"1. Add all documents from current folder:")
     print(f"   add_documents_from_folder()")
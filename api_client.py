@@ -0,0 +1,22 @@
+"""
+Shared HTTP client setup for the Knowledge Graph scripts
+"""
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+def make_session() -> requests.Session:
+    """
+    Create a session that reuses pooled keep-alive connections to the API
+    
+    Returns:
+        requests.Session retrying failed connections up to 3 times
+    """
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=10,
+        max_retries=Retry(total=3, backoff_factor=0.2)
+    ))
+    return session
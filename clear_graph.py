@@ -4,21 +4,19 @@ Clear all data from the knowledge graph
 
 import requests
 
+from api_client import make_session
+
 API_BASE = "http://localhost:8000"
 
+SESSION = make_session()
+
 def clear_graph():
     """Clear the entire knowledge graph"""
     print("Clearing knowledge graph...")
     
     try:
-        # Check if server is running
-        response = requests.get(f"{API_BASE}/")
-        if response.status_code != 200:
-            print("ERROR: Server not running. Please start with: py start_server.py")
-            return False
-        
         # Clear the graph using the API endpoint
-        response = requests.delete(f"{API_BASE}/clear")
+        response = SESSION.delete(f"{API_BASE}/clear")
         
         if response.status_code == 200:
             result = response.json()
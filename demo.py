@@ -2,13 +2,20 @@
 Demo script to showcase the Knowledge Graph functionality
 """
 
+import heapq
 import requests
-import json
-import time
+import orjson
 from pathlib import Path
 
+from api_client import make_session
+
 API_BASE = "http://localhost:8000"
 
+# Display marker for each node type
+EMOJI = {'note': '📝', 'pdf': '📄', 'link': '🔗'}
+
+SESSION = make_session()
+
 def print_header(title):
     """Print a formatted header"""
     print(f"\n{'='*60}")
@@ -50,8 +57,8 @@ def demo_ingestion():
     # Add links JSON
     links_file = test_data_dir / "saved_links.json"
     if links_file.exists():
-        with open(links_file, 'r') as f:
-            links_data = json.load(f)
+        with open(links_file, 'rb') as f:
+            links_data = orjson.loads(f.read())
         print(f"\nFound {len(links_data)} saved links:")
         for link in links_data[:3]:
             print(f"  • {link['title']}")
@@ -65,7 +72,7 @@ def demo_ingestion():
     # Ingest data
     print("\n🔄 Processing data and building semantic graph...")
     try:
-        response = requests.post(f"{API_BASE}/ingest", files=files)
+        response = SESSION.post(f"{API_BASE}/ingest", files=files)
     finally:
         # Close all file handles
         for fh in file_handles:
@@ -86,7 +93,7 @@ def demo_graph_exploration():
     """Demonstrate graph exploration"""
     print_section("🕸️ Step 2: Graph Exploration")
     
-    response = requests.get(f"{API_BASE}/graph")
+    response = SESSION.get(f"{API_BASE}/graph")
     if response.status_code != 200:
         print(f"ERROR: Error retrieving graph: {response.text}")
         return None
@@ -96,7 +103,7 @@ def demo_graph_exploration():
     
     print("\n📝 Knowledge Nodes:")
     for i, node in enumerate(graph_data['nodes'], 1):
-        node_type_emoji = "📝" if node['node_type'] == 'note' else "🔗"
+        node_type_emoji = EMOJI.get(node['node_type'], '•')
         print(f"   {i}. {node_type_emoji} {node['title']}")
         if node['keywords']:
             keywords = ', '.join(node['keywords'][:4])
@@ -106,11 +113,12 @@ def demo_graph_exploration():
     
     # Show strongest connections
     print("\n🔗 Strongest Semantic Connections:")
-    sorted_edges = sorted(graph_data['edges'], key=lambda x: x['weight'], reverse=True)
+    node_by_id = {n['id']: n for n in graph_data['nodes']}
+    top_edges = heapq.nlargest(5, graph_data['edges'], key=lambda x: x['weight'])
     
-    for i, edge in enumerate(sorted_edges[:5], 1):
-        source_node = next(n for n in graph_data['nodes'] if n['id'] == edge['source'])
-        target_node = next(n for n in graph_data['nodes'] if n['id'] == edge['target'])
+    for i, edge in enumerate(top_edges, 1):
+        source_node = node_by_id[edge['source']]
+        target_node = node_by_id[edge['target']]
         
         print(f"   {i}. {source_node['title']}")
         print(f"      ↔ {target_node['title']}")
@@ -136,18 +144,20 @@ def demo_adaptive_learning(graph_data):
         target_node = ai_nodes[0]
         print(f"\n👆 User frequently clicks on: '{target_node['title']}'")
         
-        # Record multiple interactions
-        for i in range(3):
-            feedback_data = {
+        # Record multiple interactions in a single batched request
+        feedback_data = [
+            {
                 "node_id": target_node['id'],
                 "interaction_type": "click",
                 "duration": 20.0 + i * 5
             }
-            
-            response = requests.post(f"{API_BASE}/feedback", json=feedback_data)
-            if response.status_code == 200:
+            for i in range(3)
+        ]
+        
+        response = SESSION.post(f"{API_BASE}/feedback", json=feedback_data)
+        if response.status_code == 200:
+            for i in range(len(feedback_data)):
                 print(f"   📈 Interaction {i+1} recorded - boosting connected edges")
-            time.sleep(0.5)  # Small delay for demo effect
         
         print(f"\n Result: Edges connected to '{target_node['title']}' are now stronger!")
         print("   This helps the system learn your interests and surface related content.")
@@ -156,7 +166,7 @@ def demo_statistics():
     """Show graph statistics and insights"""
     print_section(" Step 4: Analytics & Insights")
     
-    response = requests.get(f"{API_BASE}/stats")
+    response = SESSION.get(f"{API_BASE}/stats")
     if response.status_code != 200:
         print(f"ERROR: Error getting stats: {response.text}")
         return
@@ -173,7 +183,7 @@ def demo_statistics():
     if 'node_types' in stats:
         print(f"\n📋 Content Types:")
         for node_type, count in stats['node_types'].items():
-            emoji = "📝" if node_type == 'note' else "🔗"
+            emoji = EMOJI.get(node_type, '•')
             print(f"   • {emoji} {node_type.title()}: {count}")
     
     if 'most_connected_nodes' in stats:
@@ -209,11 +219,6 @@ def demo_conclusion():
 def main():
     """Run the complete demo"""
     try:
-        # Check if server is running
-        response = requests.get(f"{API_BASE}/")
-        if response.status_code != 200:
-            raise requests.exceptions.ConnectionError()
-        
         # Run demo steps
         if demo_ingestion():
             graph_data = demo_graph_exploration()
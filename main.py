@@ -5,12 +5,18 @@ This application creates a semantic knowledge graph from personal data sources
 (markdown notes and saved links) and adapts based on user interactions.
 """
 
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, UploadFile, File, Header, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
-import json
+from fastapi.responses import ORJSONResponse
+from typing import List, Dict, Any, FrozenSet, Optional, Tuple, Union
+import asyncio
+import hashlib
 import logging
+import os
+import msgspec
+import orjson
 
 from src.ingestion import DataIngestion
 from src.graph_builder import GraphBuilder
@@ -20,10 +26,27 @@ from src.models import GraphResponse, FeedbackRequest, IngestResponse
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load the embedding model on startup and release ingestion workers on shutdown"""
+    global ingestion, graph_builder
+    # Built here rather than at import time, so processes that only import
+    # this module (spawned worker processes, the reload supervisor) never
+    # load the embedding model
+    ingestion = DataIngestion()
+    graph_builder = GraphBuilder(
+        backend=os.getenv("EMBEDDING_BACKEND", "torch"),
+        embedding_cache=os.getenv("EMBEDDING_CACHE", "embeddings.npz") or None
+    )
+    yield
+    ingestion.close()
+
 app = FastAPI(
     title="Adaptive Personal Knowledge Graph",
     description="An API for building and adapting personal knowledge graphs from notes and links",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # Enable CORS for React frontend
@@ -35,9 +58,37 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global instances
-ingestion = DataIngestion()
-graph_builder = GraphBuilder()
+# Global instances, created by the lifespan handler
+ingestion: Optional[DataIngestion] = None
+graph_builder: Optional[GraphBuilder] = None
+
+# Bound how many ingest jobs run at once; requests beyond that get a 429
+MAX_CONCURRENT_INGEST = int(os.getenv("MAX_CONCURRENT_INGEST", "4"))
+ingest_semaphore = asyncio.Semaphore(MAX_CONCURRENT_INGEST)
+
+# Graph builds run in worker threads, so every graph read and write
+# goes through this lock to never observe a half-built graph. Readers run
+# synchronously on the event loop and never overlap each other, so a plain
+# lock behaves like a reader/writer lock here; writers keep it short by
+# embedding before they acquire it.
+graph_lock = asyncio.Lock()
+
+# Serialized /graph and /stats payloads, each with the graph version it was
+# built from; a payload is served only while that version is current
+_graph_cache: Optional[Tuple[int, bytes]] = None
+_stats_cache: Optional[Tuple[int, bytes]] = None
+
+def _hash_uploads(uploads: List[bytes]) -> FrozenSet[str]:
+    """SHA-256 hex digests of the raw upload bodies"""
+    return frozenset(hashlib.sha256(content).hexdigest() for content in uploads)
+
+async def _read_upload(file: UploadFile) -> Dict[str, Any]:
+    """Read an uploaded file into an ingestion record"""
+    content = await file.read()
+    return {
+        "filename": file.filename,
+        "content": content  # Raw bytes, decoded (if needed) during ingestion
+    }
 
 @app.get("/")
 async def root():
@@ -48,7 +99,9 @@ async def root():
 async def ingest_data(
     markdown_files: List[UploadFile] = File(None),
     pdf_files: List[UploadFile] = File(None),
-    links_file: UploadFile = File(None)
+    links_file: UploadFile = File(None),
+    skip_existing: bool = False,
+    content_length: Optional[int] = Header(None)
 ):
     """
     Ingest personal data sources and build the knowledge graph.
@@ -57,64 +110,90 @@ async def ingest_data(
         markdown_files: List of markdown note files
         pdf_files: List of PDF document files
         links_file: JSON/CSV file containing saved links
+        skip_existing: Keep the current graph if it was built from exactly these files
+        content_length: Declared request body size, logged to spot oversized uploads
     
     Returns:
         IngestResponse: Summary of ingested data and graph statistics
     """
-    try:
-        logger.info("Starting data ingestion...")
-        
-        # Process markdown files
-        markdown_data = []
-        if markdown_files:
-            for file in markdown_files:
-                content = await file.read()
-                markdown_data.append({
-                    "filename": file.filename,
-                    "content": content.decode('utf-8')
-                })
-        
-        # Process PDF files
-        pdf_data = []
-        if pdf_files:
-            for file in pdf_files:
-                content = await file.read()
-                pdf_data.append({
-                    "filename": file.filename,
-                    "content": content  # Keep as bytes for PDF processing
-                })
-        
-        # Process links file
-        links_data = None
-        if links_file:
-            content = await links_file.read()
-            if links_file.filename.endswith('.json'):
-                links_data = json.loads(content.decode('utf-8'))
-            elif links_file.filename.endswith('.csv'):
-                # Handle CSV parsing in ingestion module
-                links_data = content.decode('utf-8')
-        
-        # Extract and process data
-        processed_data = ingestion.process_data(markdown_data, links_data, pdf_data)
-        
-        # Build/update the graph
-        graph_stats = graph_builder.build_graph(processed_data)
-        
-        logger.info(f"Ingestion complete. Processed {len(processed_data)} items.")
-        
-        return IngestResponse(
-            status="success",
-            items_processed=len(processed_data),
-            nodes_created=graph_stats["nodes"],
-            edges_created=graph_stats["edges"],
-            message="Data successfully ingested and graph updated"
+    # Shed load instead of queueing unbounded ingest jobs
+    if ingest_semaphore.locked():
+        raise HTTPException(
+            status_code=429,
+            detail="Too many ingest requests in progress. Please retry shortly."
         )
-        
-    except Exception as e:
-        logger.error(f"Error during ingestion: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Ingestion failed: {str(e)}")
+    
+    async with ingest_semaphore:
+        try:
+            size = f"{content_length} bytes" if content_length is not None else "unknown size"
+            logger.info(f"Starting data ingestion ({size})...")
+            
+            # Read markdown and PDF uploads concurrently
+            markdown_data, pdf_data = await asyncio.gather(
+                asyncio.gather(*(_read_upload(f) for f in markdown_files or [])),
+                asyncio.gather(*(_read_upload(f) for f in pdf_files or []))
+            )
+            
+            links_content = await links_file.read() if links_file else None
+            
+            # Fingerprint the uploads so an unchanged batch can skip re-embedding
+            uploads = [record["content"] for record in (*markdown_data, *pdf_data)]
+            if links_content is not None:
+                uploads.append(links_content)
+            # Off the event loop, so large batches don't stall other requests
+            # (hashlib releases the GIL while hashing large buffers)
+            source_hashes = await run_in_threadpool(_hash_uploads, uploads)
+            
+            if skip_existing:
+                async with graph_lock:
+                    if source_hashes == graph_builder.source_hashes and graph_builder.graph:
+                        logger.info("Uploaded sources unchanged, keeping the current graph")
+                        return IngestResponse(
+                            status="success",
+                            items_processed=0,
+                            nodes_created=graph_builder.graph.number_of_nodes(),
+                            edges_created=graph_builder.graph.number_of_edges(),
+                            message="Sources unchanged since the last ingest; graph left as is"
+                        )
+            
+            # Process links file
+            links_data = None
+            if links_file:
+                if links_file.filename.endswith('.json'):
+                    links_data = orjson.loads(links_content)
+                elif links_file.filename.endswith('.csv'):
+                    # Handle CSV parsing in ingestion module
+                    links_data = links_content.decode('utf-8')
+            
+            # Extract and process data (CPU-bound, keep it off the event loop)
+            processed_data = await run_in_threadpool(
+                ingestion.process_data, markdown_data, links_data, pdf_data
+            )
+            
+            # Embed outside the lock so graph reads are only blocked by the swap
+            embeddings = await run_in_threadpool(graph_builder.embed_items, processed_data)
+            
+            # Build/update the graph
+            async with graph_lock:
+                graph_stats = await run_in_threadpool(
+                    graph_builder.build_graph, processed_data, embeddings, source_hashes
+                )
+            
+            logger.info(f"Ingestion complete. Processed {len(processed_data)} items.")
+            
+            return IngestResponse(
+                status="success",
+                items_processed=len(processed_data),
+                nodes_created=graph_stats["nodes"],
+                edges_created=graph_stats["edges"],
+                message="Data successfully ingested and graph updated"
+            )
+            
+        except Exception as e:
+            logger.error(f"Error during ingestion: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Ingestion failed: {str(e)}")
 
-@app.get("/graph", response_model=GraphResponse)
+@app.get("/graph", responses={200: {"model": GraphResponse}})
 async def get_graph():
     """
     Retrieve the current knowledge graph with nodes and weighted edges.
@@ -122,43 +201,68 @@ async def get_graph():
     Returns:
         GraphResponse: Complete graph data including nodes, edges, and metadata
     """
+    global _graph_cache
     try:
         logger.info("Retrieving graph data...")
-        graph_data = graph_builder.get_graph_data()
-        
-        if not graph_data["nodes"]:
-            raise HTTPException(
-                status_code=404, 
-                detail="No graph data found. Please ingest data first."
-            )
+        cached = _graph_cache
+        if cached is not None and cached[0] == graph_builder.version:
+            content = cached[1]
+        else:
+            async with graph_lock:
+                graph_data = graph_builder.get_graph_data()
+                
+                if not graph_data.nodes:
+                    raise HTTPException(
+                        status_code=404, 
+                        detail="No graph data found. Please ingest data first."
+                    )
+                
+                content = msgspec.json.encode(graph_data)
+                _graph_cache = (graph_builder.version, content)
         
-        return GraphResponse(**graph_data)
+        return Response(content=content, media_type="application/json")
         
     except Exception as e:
         logger.error(f"Error retrieving graph: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to retrieve graph: {str(e)}")
 
 @app.post("/feedback")
-async def record_feedback(feedback: FeedbackRequest):
+async def record_feedback(feedback: Union[FeedbackRequest, List[FeedbackRequest]]):
     """
     Record user interaction feedback to adapt the graph weights.
     
     Args:
-        feedback: User interaction data (node clicks, time spent, etc.)
+        feedback: User interaction data (node clicks, time spent, etc.),
+            either a single interaction or a batch of them
     
     Returns:
-        dict: Confirmation of feedback processing
+        dict: Confirmation of feedback processing. For a batch,
+            updated_connections maps each node ID to its connections.
     """
     try:
-        logger.info(f"Recording feedback for node: {feedback.node_id}")
+        batch = feedback if isinstance(feedback, list) else [feedback]
+        logger.info(f"Recording feedback for nodes: {[item.node_id for item in batch]}")
         
-        # Update graph weights based on user interaction
-        graph_builder.update_weights_from_feedback(feedback)
+        # Apply the whole batch under a single lock acquisition
+        async with graph_lock:
+            for item in batch:
+                graph_builder.update_weights_from_feedback(item)
+            updated_connections = {
+                item.node_id: graph_builder.get_node_connections(item.node_id)
+                for item in batch
+            }
+        
+        if isinstance(feedback, list):
+            return {
+                "status": "success",
+                "message": f"Feedback recorded for {len(batch)} interactions",
+                "updated_connections": updated_connections
+            }
         
         return {
             "status": "success",
             "message": f"Feedback recorded for node {feedback.node_id}",
-            "updated_connections": graph_builder.get_node_connections(feedback.node_id)
+            "updated_connections": updated_connections[feedback.node_id]
         }
         
     except Exception as e:
@@ -168,12 +272,30 @@ async def record_feedback(feedback: FeedbackRequest):
 @app.get("/stats")
 async def get_stats():
     """Get current graph statistics and metadata"""
+    global _stats_cache
     try:
-        return graph_builder.get_graph_stats()
+        cached = _stats_cache
+        if cached is not None and cached[0] == graph_builder.version:
+            content = cached[1]
+        else:
+            async with graph_lock:
+                content = orjson.dumps(
+                    graph_builder.get_graph_stats(),
+                    option=orjson.OPT_SERIALIZE_NUMPY
+                )
+                _stats_cache = (graph_builder.version, content)
+        
+        return Response(content=content, media_type="application/json")
     except Exception as e:
         logger.error(f"Error getting stats: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to get stats: {str(e)}")
 
+@app.get("/sources")
+async def get_sources():
+    """List the SHA-256 digests of the files the current graph was built from"""
+    async with graph_lock:
+        return {"sources": sorted(graph_builder.source_hashes)}
+
 @app.delete("/clear")
 async def clear_graph():
     """Clear all data from the knowledge graph"""
@@ -181,9 +303,8 @@ async def clear_graph():
         logger.info("Clearing knowledge graph...")
         
         # Clear the graph
-        graph_builder.graph.clear()
-        graph_builder.embeddings_cache.clear()
-        graph_builder.node_data.clear()
+        async with graph_lock:
+            graph_builder.clear()
         
         # Clear ingestion data
         ingestion.processed_items = []
@@ -202,5 +323,7 @@ async def clear_graph():
         raise HTTPException(status_code=500, detail=f"Failed to clear graph: {str(e)}")
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
+    # Hand off to start_server.py as the real __main__, so it (not this
+    # module) is what spawned worker processes re-import
+    import runpy
+    runpy.run_module("start_server", run_name="__main__", alter_sys=True)
@@ -2,70 +2,284 @@
 Graph construction and management using NetworkX and semantic embeddings
 """
 
+import heapq
 import networkx as nx
 import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components
+import simsimd
+import torch
+from blake3 import blake3
 from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Optional, Tuple, FrozenSet
 import logging
-from datetime import datetime
+import os
+import threading
 import json
+from collections import Counter
 
-from .models import NodeData, EdgeData, FeedbackRequest
+from .models import NodeData, EdgeData, FeedbackRequest, NodeStruct, EdgeStruct, GraphStruct, now_ms
+from .onnx_encoder import OnnxEncoder
 
 logger = logging.getLogger(__name__)
 
+# Builds with more texts than this shard encoding across processes
+MULTI_PROCESS_MIN_TEXTS = 1000
+
+# Graphs with more nodes than this find edge candidates with an approximate
+# nearest-neighbor index (hnswlib, optional) instead of all N^2 pairs
+ANN_MIN_NODES = 5000
+ANN_NEIGHBORS = 50
+
 class GraphBuilder:
     """Builds and manages the adaptive knowledge graph"""
     
-    def __init__(self, similarity_threshold: float = 0.3, embedding_model: str = "all-MiniLM-L6-v2"):
+    def __init__(self, similarity_threshold: float = 0.3, embedding_model: str = "all-MiniLM-L6-v2",
+                 device: Optional[str] = None, backend: str = "torch", max_seq_length: int = 128,
+                 embedding_cache: Optional[str] = None):
         """
         Initialize the graph builder
         
         Args:
             similarity_threshold: Minimum similarity score to create an edge
             embedding_model: Name of the sentence transformer model to use
+            device: Torch device for encoding (default: CUDA, then MPS, then CPU)
+            backend: "torch" for sentence-transformers, "onnx" for ONNX Runtime via optimum
+            max_seq_length: Tokens of each node's text the model reads; encode cost
+                scales with it, and the title and keywords come first
+            embedding_cache: Path of an .npz file that keeps embeddings between
+                runs, keyed by a hash of each node's text (default: no cache)
         """
         self.graph = nx.Graph()
         self.similarity_threshold = similarity_threshold
-        self.embeddings_cache = {}
+        # Embeddings live in one contiguous float32 matrix, one row per node
+        self.embeddings_matrix = np.empty((0, 0), dtype=np.float32)
+        self.node_id_to_row: Dict[str, int] = {}
+        self.row_node_ids: List[str] = []
+        # Symmetric CSR matrix of edge weights over the same rows, for fast
+        # read-side queries; NetworkX stays the source of edge attributes
+        self.adjacency = sp.csr_matrix((0, 0))
         self.node_data = {}
-        
-        # Load the embedding model
-        logger.info(f"Loading embedding model: {embedding_model}")
+        # SHA-256 digests of the uploaded files the current graph was built from
+        self.source_hashes: FrozenSet[str] = frozenset()
+        # Bumped on every change to the graph, so callers can cache views of it
+        self.version = 0
+        self._reset_stats()
+        
+        # Load the embedding model on the fastest available device
+        device = device or self._detect_device()
+        self.device = device
+        if device == "cpu":
+            # CPU encoding throughput levels off around 4-8 threads
+            torch.set_num_threads(min(8, os.cpu_count() or 1))
+        logger.info(f"Loading embedding model: {embedding_model} on {device} ({backend})")
         try:
-            self.embedding_model = SentenceTransformer(embedding_model)
+            if backend == "onnx":
+                self.embedding_model = OnnxEncoder(embedding_model, device=device)
+            else:
+                self.embedding_model = SentenceTransformer(embedding_model, device=device)
+            # Both backends truncate inputs by tokens at this length
+            self.embedding_model.max_seq_length = max_seq_length
             logger.info("Embedding model loaded successfully")
         except Exception as e:
             logger.error(f"Failed to load embedding model: {e}")
             raise
+        
+        # Embeddings of previously seen texts, so unchanged documents are not
+        # re-encoded; stored vectors are only valid for this exact model setup
+        self._embedding_cache_path = embedding_cache
+        self._embedding_cache_model = f"{embedding_model}|{backend}|{max_seq_length}"
+        self._embedding_cache_lock = threading.Lock()
+        self._embedding_cache = self._load_embedding_cache()
+    
+    @staticmethod
+    def _detect_device() -> str:
+        """Pick the best available torch device for encoding"""
+        if torch.cuda.is_available():
+            return "cuda"
+        if torch.backends.mps.is_available():
+            return "mps"
+        return "cpu"
+    
+    def _pool_devices(self) -> List[str]:
+        """Devices to shard a large encode across, or [] to encode in-process"""
+        if not isinstance(self.embedding_model, SentenceTransformer):
+            return []
+        if self.device == "cuda":
+            devices = [f"cuda:{i}" for i in range(torch.cuda.device_count())]
+        elif self.device == "cpu":
+            # Half the cores, since each process runs several torch threads
+            devices = ["cpu"] * min(4, (os.cpu_count() or 1) // 2)
+        else:
+            devices = []
+        return devices if len(devices) > 1 else []
+    
+    def _load_embedding_cache(self) -> Dict[str, np.ndarray]:
+        """Read the on-disk embedding cache, or start empty if it is missing or stale"""
+        if not self._embedding_cache_path or not os.path.exists(self._embedding_cache_path):
+            return {}
+        try:
+            with np.load(self._embedding_cache_path, allow_pickle=False) as data:
+                if str(data['model']) != self._embedding_cache_model:
+                    logger.info("Embedding cache was built with another model, ignoring it")
+                    return {}
+                cache = dict(zip(data['keys'].tolist(), data['vectors']))
+        except Exception as e:
+            logger.warning(f"Could not read embedding cache: {e}")
+            return {}
+        logger.info(f"Loaded {len(cache)} cached embeddings")
+        return cache
     
-    def build_graph(self, items: List[Dict]) -> Dict[str, int]:
+    def _save_embedding_cache(self):
+        """Write the embedding cache atomically; callers hold the cache lock"""
+        keys = list(self._embedding_cache)
+        vectors = np.array([self._embedding_cache[key] for key in keys], dtype=np.float16)
+        tmp_path = f"{self._embedding_cache_path}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, model=np.array(self._embedding_cache_model),
+                         keys=np.array(keys, dtype=str), vectors=vectors)
+            os.replace(tmp_path, self._embedding_cache_path)
+        except OSError as e:
+            logger.warning(f"Could not write embedding cache: {e}")
+    
+    def embed_items(self, items: List[Dict]) -> np.ndarray:
+        """
+        Generate embeddings for processed items without touching graph state
+        
+        This is the expensive part of a build, so callers can run it outside
+        whatever lock guards the graph and pass the result to build_graph.
+        With an embedding cache, only texts not seen before are encoded.
+        
+        Args:
+            items: List of processed items from ingestion
+            
+        Returns:
+            Array of embeddings, one row per unique item ID in input order
+        """
+        logger.info("Generating embeddings for all nodes...")
+        
+        # Combine title, top keywords, and content for embedding; the tokenizer
+        # cuts each text at max_seq_length tokens, so the character window
+        # only bounds tokenization work
+        texts = []
+        for item in self._unique_items(items):
+            keywords_text = " ".join(item.get('keywords', [])[:8])
+            texts.append(f"{item['title']}. {keywords_text}. {item['content'][:1500]}")
+        
+        if not self._embedding_cache_path or not texts:
+            return self._encode_texts(texts)
+        
+        # The ID hash covers content only, so key on the full embedded text
+        keys = [blake3(text.encode('utf-8')).hexdigest(length=16) for text in texts]
+        with self._embedding_cache_lock:
+            cached = {key: self._embedding_cache[key] for key in keys if key in self._embedding_cache}
+        misses = [i for i, key in enumerate(keys) if key not in cached]
+        logger.info(f"{len(texts) - len(misses)} embeddings cached, encoding {len(misses)}")
+        
+        if misses:
+            encoded = self._encode_texts([texts[i] for i in misses]).astype(np.float16)
+            cached.update(zip((keys[i] for i in misses), encoded))
+        
+        # Vectors go through float16 either way, so a build gives the same
+        # graph whether or not its embeddings came from the cache
+        embeddings = np.array([cached[key] for key in keys], dtype=np.float32)
+        
+        # The cache mirrors the latest build, like the graph itself
+        with self._embedding_cache_lock:
+            if misses or len(self._embedding_cache) != len(cached):
+                self._embedding_cache = cached
+                self._save_embedding_cache()
+        return embeddings
+    
+    def _encode_texts(self, texts: List[str]) -> np.ndarray:
+        """Encode texts to unit-length embeddings, sharding large runs across processes"""
+        devices = self._pool_devices() if len(texts) > MULTI_PROCESS_MIN_TEXTS else []
+        if devices:
+            # Shard large builds across processes, which is worth the startup cost
+            pool = self.embedding_model.start_multi_process_pool(target_devices=devices)
+            try:
+                embeddings = self.embedding_model.encode_multi_process(texts, pool, batch_size=64)
+            finally:
+                self.embedding_model.stop_multi_process_pool(pool)
+            # The pool cannot normalize, so match the single-process output here
+            embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        else:
+            # Encode in length-sorted batches; unit-norm output makes the dot
+            # product the cosine similarity
+            embeddings = self.embedding_model.encode(
+                texts,
+                batch_size=64,
+                show_progress_bar=False,
+                convert_to_numpy=True,
+                normalize_embeddings=True
+            )
+        
+        logger.info(f"Generated embeddings for {len(texts)} texts")
+        return embeddings
+    
+    def clear(self):
+        """Remove all nodes, edges, embeddings and source records"""
+        self._reset()
+        self.version += 1
+    
+    def _reset(self):
+        """Empty the graph without bumping version, for rebuilds that bump it once done"""
+        self.graph.clear()
+        self.embeddings_matrix = np.empty((0, 0), dtype=np.float32)
+        self.node_id_to_row = {}
+        self.row_node_ids = []
+        self.adjacency = sp.csr_matrix((0, 0))
+        self.node_data.clear()
+        self.source_hashes = frozenset()
+        self._reset_stats()
+    
+    def _reset_stats(self):
+        """Reset the running aggregates behind get_graph_stats"""
+        self._node_type_counts = Counter()
+        self._total_clicks = 0
+        self._weight_sum = 0.0
+        self._weight_max = float('-inf')
+        self._weight_min = float('inf')
+        self._weight_min_stale = False  # Set when the minimum edge was boosted
+        # Connectivity and top-degree nodes, recomputed after structural changes
+        self._structure_stats: Optional[Dict[str, Any]] = None
+    
+    def build_graph(self, items: List[Dict], embeddings: Optional[np.ndarray] = None,
+                    source_hashes: FrozenSet[str] = frozenset()) -> Dict[str, int]:
         """
         Build the knowledge graph from processed items
         
         Args:
             items: List of processed items from ingestion
+            embeddings: Precomputed output of embed_items(items), if any
+            source_hashes: Digests of the uploaded files the items came from
             
         Returns:
             Dictionary with graph statistics
         """
         logger.info(f"Building graph from {len(items)} items...")
         
-        # Clear existing graph
-        self.graph.clear()
-        self.embeddings_cache.clear()
-        self.node_data.clear()
+        items = self._unique_items(items)
+        if embeddings is None:
+            embeddings = self.embed_items(items)
+        
+        # Clear existing graph; version stays put until the new one is complete
+        self._reset()
+        self.source_hashes = source_hashes
         
         # Add nodes
         for item in items:
             self._add_node(item)
         
-        # Generate embeddings for all nodes
-        self._generate_embeddings()
+        # Keep embeddings as a single matrix whose rows follow item order
+        self.embeddings_matrix = np.asarray(embeddings, dtype=np.float32)
+        self.node_id_to_row = {item['id']: row for row, item in enumerate(items)}
+        self.row_node_ids = [item['id'] for item in items]
         
         # Calculate similarities and add edges
         self._add_similarity_edges()
+        self.version += 1
         
         # Calculate graph statistics
         stats = {
@@ -76,6 +290,11 @@ class GraphBuilder:
         logger.info(f"Graph built: {stats['nodes']} nodes, {stats['edges']} edges")
         return stats
     
+    @staticmethod
+    def _unique_items(items: List[Dict]) -> List[Dict]:
+        """Collapse items sharing an ID, keeping first position and last value"""
+        return list({item['id']: item for item in items}.values())
+    
     def _add_node(self, item: Dict):
         """Add a single node to the graph"""
         node_id = item['id']
@@ -88,108 +307,140 @@ class GraphBuilder:
             node_type=item['node_type'],
             keywords=item.get('keywords', []),
             source_file=item.get('source_file'),
-            created_at=item.get('created_at', datetime.now())
+            created_at_ms=item.get('created_at_ms', now_ms())
         )
         
-        # Add to graph with attributes
-        self.graph.add_node(node_id, **node_data.model_dump())
-        
-        # Store in our cache for quick access
+        # The graph only carries lightweight attributes; the full payload
+        # (content, keywords, ...) lives once, in node_data
+        self.graph.add_node(node_id, node_type=node_data.node_type, click_count=node_data.click_count)
         self.node_data[node_id] = node_data
         
-        logger.debug(f"Added node: {node_id} - {item['title']}")
-    
-    def _generate_embeddings(self):
-        """Generate embeddings for all nodes"""
-        logger.info("Generating embeddings for all nodes...")
+        self._node_type_counts[node_data.node_type] += 1
+        self._total_clicks += node_data.click_count
+        self._structure_stats = None
         
-        # Prepare texts for embedding
-        node_ids = list(self.node_data.keys())
-        texts = []
-        
-        for node_id in node_ids:
-            node = self.node_data[node_id]
-            # Combine title, keywords, and content snippet for embedding
-            keywords_text = " ".join(node.keywords)
-            content_snippet = node.content[:500]  # First 500 chars
-            combined_text = f"{node.title} {keywords_text} {content_snippet}"
-            texts.append(combined_text)
-        
-        # Generate embeddings in batch for efficiency
-        embeddings = self.embedding_model.encode(texts)
-        
-        # Cache embeddings
-        for node_id, embedding in zip(node_ids, embeddings):
-            self.embeddings_cache[node_id] = embedding
-        
-        logger.info(f"Generated embeddings for {len(node_ids)} nodes")
+        logger.debug(f"Added node: {node_id} - {item['title']}")
     
     def _add_similarity_edges(self):
         """Calculate similarities and add edges between similar nodes"""
         logger.info("Calculating similarities and adding edges...")
         
-        node_ids = list(self.embeddings_cache.keys())
-        embeddings = np.array([self.embeddings_cache[node_id] for node_id in node_ids])
+        node_ids = self.row_node_ids
+        n = len(node_ids)
+        if n < 2:
+            self.adjacency = sp.csr_matrix((n, n))
+            logger.info("Added 0 similarity edges")
+            return
+        
+        pairs = None
+        if n > ANN_MIN_NODES:
+            try:
+                pairs = self._approximate_similar_pairs()
+            except ImportError:
+                logger.warning("hnswlib is not installed, comparing all node pairs")
+        rows, cols, scores = pairs if pairs is not None else self._dense_similar_pairs()
         
-        # Calculate cosine similarity matrix
-        similarity_matrix = cosine_similarity(embeddings)
+        # Keep only pairs above threshold
+        mask = scores >= self.similarity_threshold
+        rows, cols, scores = rows[mask], cols[mask], scores[mask].astype(np.float64)
         
         edges_added = 0
-        for i, node1_id in enumerate(node_ids):
-            for j, node2_id in enumerate(node_ids):
-                if i >= j:  # Skip diagonal and duplicate pairs
-                    continue
-                
-                similarity_score = similarity_matrix[i][j]
-                
-                # Add edge if similarity is above threshold
-                if similarity_score >= self.similarity_threshold:
-                    self._add_edge(node1_id, node2_id, similarity_score)
-                    edges_added += 1
+        for i, j, similarity_score in zip(rows.tolist(), cols.tolist(), scores.tolist()):
+            self._add_edge(node_ids[i], node_ids[j], similarity_score)
+            edges_added += 1
+        
+        # Mirror the upper triangle into a symmetric CSR with sorted indices
+        upper = sp.coo_matrix((scores, (rows, cols)), shape=(n, n))
+        self.adjacency = (upper + upper.T).tocsr()
+        self.adjacency.sort_indices()
         
         logger.info(f"Added {edges_added} similarity edges")
     
+    def _dense_similar_pairs(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Score every node pair, returned as upper-triangle row, col, score arrays"""
+        # Compare int8 codes to move a quarter of the float32 bytes; cosine
+        # ignores the per-row scale, so scores stay within ~1e-3
+        quantized = self._quantize_int8(self.embeddings_matrix)
+        similarity_matrix = 1.0 - np.asarray(simsimd.cdist(quantized, quantized, metric="cosine"))
+        
+        # Upper triangle only: no self or duplicate pairs
+        rows, cols = np.triu_indices(len(quantized), k=1)
+        return rows, cols, similarity_matrix[rows, cols]
+    
+    def _approximate_similar_pairs(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Score each node against its nearest neighbors from an HNSW index
+        
+        Returns upper-triangle row, col, score arrays in row-major order, like
+        _dense_similar_pairs, but only for the ANN_NEIGHBORS closest nodes.
+        """
+        import hnswlib  # Optional dependency, only needed for large graphs
+        
+        embeddings = self.embeddings_matrix
+        n = len(embeddings)
+        index = hnswlib.Index(space='cosine', dim=embeddings.shape[1])
+        index.init_index(max_elements=n, ef_construction=200, M=16)
+        index.add_items(embeddings, np.arange(n))
+        k = min(ANN_NEIGHBORS, n)
+        index.set_ef(max(64, k))  # Search breadth; must be at least k
+        labels, distances = index.knn_query(embeddings, k=k)
+        
+        # Neighbor lists are one-sided, so fold each pair into (low, high)
+        # and keep one copy of pairs found from both ends
+        rows = np.repeat(np.arange(n), k)
+        cols = labels.ravel().astype(np.int64)
+        scores = 1.0 - distances.ravel()
+        not_self = rows != cols
+        low = np.minimum(rows, cols)[not_self]
+        high = np.maximum(rows, cols)[not_self]
+        pair_keys, first = np.unique(low * n + high, return_index=True)
+        return pair_keys // n, pair_keys % n, scores[not_self][first]
+    
+    @staticmethod
+    def _quantize_int8(embeddings: np.ndarray) -> np.ndarray:
+        """Scale each row so its largest component maps to +/-127 and round to int8"""
+        scale = np.abs(embeddings).max(axis=1, keepdims=True)
+        scale[scale == 0] = 1.0
+        return np.round(embeddings * (127.0 / scale)).astype(np.int8)
+    
     def _add_edge(self, node1_id: str, node2_id: str, weight: float, edge_type: str = "semantic"):
         """Add an edge between two nodes"""
-        # Create edge data
-        edge_data = EdgeData(
+        # Edges are derived from the graph's own similarity scores, so they
+        # skip validation; nodes carry uploaded data and stay validated
+        edge_data = EdgeData.trusted(
             source=node1_id,
             target=node2_id,
             weight=weight,
             similarity_type=edge_type,
-            created_at=datetime.now()
+            created_at_ms=now_ms()
         )
         
         # Add to graph
         self.graph.add_edge(node1_id, node2_id, **edge_data.model_dump())
+        
+        self._weight_sum += weight
+        self._weight_max = max(self._weight_max, weight)
+        self._weight_min = min(self._weight_min, weight)
+        self._structure_stats = None
     
-    def get_graph_data(self) -> Dict[str, Any]:
+    def get_graph_data(self) -> GraphStruct:
         """
         Get complete graph data for API response
         
         Returns:
-            Dictionary containing nodes, edges, and metadata
+            GraphStruct containing nodes, edges, and metadata, ready for msgspec
         """
-        nodes = []
-        edges = []
-        
-        # Collect nodes
-        for node_id, node_attrs in self.graph.nodes(data=True):
-            node_data = NodeData(**node_attrs)
-            nodes.append(node_data)
-        
-        # Collect edges
-        for source, target, edge_attrs in self.graph.edges(data=True):
-            edge_data = EdgeData(**edge_attrs)
-            edges.append(edge_data)
-        
-        return {
-            "nodes": nodes,
-            "edges": edges,
-            "total_nodes": len(nodes),
-            "total_edges": len(edges),
-            "last_updated": datetime.now()
-        }
+        # Node payloads come from the node_data side table; edge attributes were
+        # dumped from EdgeData models when added, so both map field for field
+        nodes = [NodeStruct(**vars(node)) for node in self.node_data.values()]
+        edges = [EdgeStruct(**edge_attrs) for _, _, edge_attrs in self.graph.edges(data=True)]
+        
+        return GraphStruct(
+            nodes=nodes,
+            edges=edges,
+            total_nodes=len(nodes),
+            total_edges=len(edges)
+        )
     
     def update_weights_from_feedback(self, feedback: FeedbackRequest):
         """
@@ -203,51 +454,83 @@ class GraphBuilder:
         if node_id not in self.graph:
             logger.warning(f"Node {node_id} not found in graph")
             return
+        self.version += 1
         
-        # Update click count for the node
-        if node_id in self.node_data:
-            self.node_data[node_id].click_count += 1
-            self.graph.nodes[node_id]['click_count'] = self.node_data[node_id].click_count
+        # Update click count for the node; NodeData is frozen, so the stored
+        # payload is replaced by a (shallow) copy with the new count
+        node = self.node_data.get(node_id)
+        if node is not None:
+            node = node.model_copy(update={'click_count': node.click_count + 1})
+            self.node_data[node_id] = node
+            self.graph.nodes[node_id]['click_count'] = node.click_count
+            self._total_clicks += 1
         
         # Boost weights of edges connected to this node
         boost_factor = 1.1  # 10% boost
         max_weight = 1.0
         
-        for neighbor in self.graph.neighbors(node_id):
-            edge_data = self.graph[node_id][neighbor]
+        # graph[node_id] maps each neighbor to the shared edge attribute dict,
+        # so edges are updated in place in a single pass
+        boosted = 0
+        for neighbor, edge_data in self.graph[node_id].items():
             current_weight = edge_data.get('weight', 0.0)
             
             # Apply boost but cap at max_weight
             new_weight = min(current_weight * boost_factor, max_weight)
             
             # Update edge weight
-            self.graph[node_id][neighbor]['weight'] = new_weight
-            self.graph[node_id][neighbor]['user_boosted'] = True
+            edge_data['weight'] = new_weight
+            edge_data['user_boosted'] = True
+            self._set_adjacency_weight(node_id, neighbor, new_weight)
+            boosted += 1
+            
+            # Boosts only raise weights, so only the minimum can go stale
+            self._weight_sum += new_weight - current_weight
+            self._weight_max = max(self._weight_max, new_weight)
+            if current_weight <= self._weight_min:
+                self._weight_min_stale = True
             
             logger.debug(f"Boosted edge {node_id}-{neighbor}: {current_weight:.3f} -> {new_weight:.3f}")
         
-        logger.info(f"Applied feedback boost to node {node_id} and {len(list(self.graph.neighbors(node_id)))} connected edges")
+        logger.info(f"Applied feedback boost to node {node_id} and {boosted} connected edges")
+    
+    def _set_adjacency_weight(self, node1_id: str, node2_id: str, weight: float):
+        """Write an edge weight into both mirrored CSR entries in place"""
+        indptr, indices = self.adjacency.indptr, self.adjacency.indices
+        for row, col in ((self.node_id_to_row[node1_id], self.node_id_to_row[node2_id]),
+                         (self.node_id_to_row[node2_id], self.node_id_to_row[node1_id])):
+            start, end = indptr[row], indptr[row + 1]
+            self.adjacency.data[start + np.searchsorted(indices[start:end], col)] = weight
     
     def get_node_connections(self, node_id: str) -> List[Dict]:
         """Get all connections for a specific node"""
         if node_id not in self.graph:
             return []
         
+        # Neighbors and weights are one contiguous CSR row slice
+        row = self.node_id_to_row[node_id]
+        start, end = self.adjacency.indptr[row], self.adjacency.indptr[row + 1]
+        neighbor_rows = self.adjacency.indices[start:end]
+        weights = self.adjacency.data[start:end]
+        
+        # Sort by weight descending
+        order = np.argsort(-weights, kind='stable')
+        
         connections = []
-        for neighbor in self.graph.neighbors(node_id):
-            edge_data = self.graph[node_id][neighbor]
+        adjacent = self.graph.adj[node_id]
+        for neighbor_row, weight in zip(neighbor_rows[order].tolist(), weights[order].tolist()):
+            neighbor = self.row_node_ids[neighbor_row]
+            edge_data = adjacent[neighbor]
             neighbor_data = self.node_data.get(neighbor)
             
             connections.append({
                 "target_node_id": neighbor,
                 "target_title": neighbor_data.title if neighbor_data else neighbor,
-                "weight": edge_data.get('weight', 0.0),
+                "weight": weight,
                 "similarity_type": edge_data.get('similarity_type', 'unknown'),
                 "user_boosted": edge_data.get('user_boosted', False)
             })
         
-        # Sort by weight descending
-        connections.sort(key=lambda x: x['weight'], reverse=True)
         return connections
     
     def get_graph_stats(self) -> Dict[str, Any]:
@@ -255,45 +538,56 @@ class GraphBuilder:
         if self.graph.number_of_nodes() == 0:
             return {"status": "empty", "message": "No graph data available"}
         
+        total_nodes = self.graph.number_of_nodes()
+        
+        # Connectivity and centrality only change when nodes or edges do;
+        # degrees are the CSR row lengths
+        if self._structure_stats is None:
+            degrees = np.diff(self.adjacency.indptr)
+            centrality = degrees * (1.0 / (total_nodes - 1)) if total_nodes > 1 else np.ones(total_nodes)
+            n_components, _ = connected_components(self.adjacency, directed=False)
+            self._structure_stats = {
+                "is_connected": n_components == 1,
+                "top_nodes": heapq.nlargest(
+                    5,
+                    zip(self.row_node_ids, centrality.tolist(), degrees.tolist()),
+                    key=lambda x: x[1]
+                )
+            }
+        
+        total_edges = self.graph.number_of_edges()
+        
         # Basic stats
         stats = {
-            "total_nodes": self.graph.number_of_nodes(),
-            "total_edges": self.graph.number_of_edges(),
+            "total_nodes": total_nodes,
+            "total_edges": total_edges,
             "density": nx.density(self.graph),
-            "is_connected": nx.is_connected(self.graph),
+            "is_connected": self._structure_stats["is_connected"],
         }
         
-        # Node type distribution
-        node_types = {}
-        click_counts = []
-        for node_id, node_attrs in self.graph.nodes(data=True):
-            node_type = node_attrs.get('node_type', 'unknown')
-            node_types[node_type] = node_types.get(node_type, 0) + 1
-            click_counts.append(node_attrs.get('click_count', 0))
-        
-        stats['node_types'] = node_types
-        stats['total_clicks'] = sum(click_counts)
-        stats['avg_clicks_per_node'] = np.mean(click_counts) if click_counts else 0
+        # Node type distribution and clicks, kept up to date as nodes change
+        stats['node_types'] = dict(self._node_type_counts)
+        stats['total_clicks'] = self._total_clicks
+        stats['avg_clicks_per_node'] = self._total_clicks / total_nodes
         
         # Edge weight statistics
-        weights = [edge_attrs.get('weight', 0.0) for _, _, edge_attrs in self.graph.edges(data=True)]
-        if weights:
-            stats['avg_edge_weight'] = np.mean(weights)
-            stats['max_edge_weight'] = np.max(weights)
-            stats['min_edge_weight'] = np.min(weights)
+        if total_edges:
+            if self._weight_min_stale:
+                self._weight_min = min(weight for _, _, weight in self.graph.edges(data='weight', default=0.0))
+                self._weight_min_stale = False
+            stats['avg_edge_weight'] = self._weight_sum / total_edges
+            stats['max_edge_weight'] = self._weight_max
+            stats['min_edge_weight'] = self._weight_min
         
         # Most connected nodes
-        degree_centrality = nx.degree_centrality(self.graph)
-        top_nodes = sorted(degree_centrality.items(), key=lambda x: x[1], reverse=True)[:5]
-        
         stats['most_connected_nodes'] = []
-        for node_id, centrality in top_nodes:
+        for node_id, centrality, degree in self._structure_stats["top_nodes"]:
             node_data = self.node_data.get(node_id)
             stats['most_connected_nodes'].append({
                 "node_id": node_id,
                 "title": node_data.title if node_data else node_id,
                 "centrality": centrality,
-                "connections": self.graph.degree(node_id)
+                "connections": degree
             })
         
         return stats
@@ -308,48 +602,59 @@ class GraphBuilder:
         Returns:
             List of surprising connection information
         """
-        surprising = []
+        # Each edge once, from the upper triangle in row-major order
+        upper = sp.triu(self.adjacency, k=1, format='coo')
+        if upper.nnz == 0 or limit <= 0:
+            return []
+        order = np.lexsort((upper.col, upper.row))
+        sources, targets, weights = upper.row[order], upper.col[order], upper.data[order]
+        
+        # Per-node arrays in row order: node type, and keywords as bits of one integer
+        nodes = [self.node_data[node_id] for node_id in self.row_node_ids]
+        vocabulary = {}
+        keyword_bits = []
+        for node in nodes:
+            bits = 0
+            for keyword in node.keywords:
+                bits |= 1 << vocabulary.setdefault(keyword, len(vocabulary))
+            keyword_bits.append(bits)
+        node_types = np.array([node.node_type for node in nodes])
+        
+        overlaps = np.array([
+            bin(keyword_bits[i] & keyword_bits[j]).count("1")
+            for i, j in zip(sources.tolist(), targets.tolist())
+        ])
+        
+        # "Surprise" score based on:
+        # 1. High similarity weight
+        # 2. Different node types (boost)
+        # 3. Few overlapping keywords (reduce if many overlap)
+        scores = (weights
+                  * np.where(node_types[sources] != node_types[targets], 1.2, 1.0)
+                  * np.where(overlaps > 2, 0.8, 1.0))
+        
+        # Partition out the top scores, then order just those (ties keep edge order)
+        if len(scores) > limit:
+            cutoff = scores[np.argpartition(-scores, limit - 1)[:limit]].min()
+            candidates = np.flatnonzero(scores >= cutoff)
+        else:
+            candidates = np.arange(len(scores))
+        top = candidates[np.argsort(-scores[candidates], kind='stable')][:limit]
         
-        for source, target, edge_attrs in self.graph.edges(data=True):
-            weight = edge_attrs.get('weight', 0.0)
-            
-            # Get node data
-            source_node = self.node_data.get(source)
-            target_node = self.node_data.get(target)
-            
-            if not source_node or not target_node:
-                continue
-            
-            # Calculate "surprise" score based on:
-            # 1. High similarity weight
-            # 2. Different node types
-            # 3. Few overlapping keywords
-            
-            surprise_score = weight
-            
-            # Boost if different node types
-            if source_node.node_type != target_node.node_type:
-                surprise_score *= 1.2
-            
-            # Reduce if many overlapping keywords
-            source_keywords = set(source_node.keywords)
-            target_keywords = set(target_node.keywords)
-            overlap = len(source_keywords.intersection(target_keywords))
-            if overlap > 2:
-                surprise_score *= 0.8
-            
+        surprising = []
+        for e in top.tolist():
+            source_node = nodes[sources[e]]
+            target_node = nodes[targets[e]]
             surprising.append({
-                "source_id": source,
-                "target_id": target,
+                "source_id": source_node.id,
+                "target_id": target_node.id,
                 "source_title": source_node.title,
                 "target_title": target_node.title,
-                "weight": weight,
-                "surprise_score": surprise_score,
+                "weight": float(weights[e]),
+                "surprise_score": float(scores[e]),
                 "source_type": source_node.node_type,
                 "target_type": target_node.node_type,
-                "overlapping_keywords": list(source_keywords.intersection(target_keywords))
+                "overlapping_keywords": list(set(source_node.keywords).intersection(target_node.keywords))
             })
         
-        # Sort by surprise score and return top results
-        surprising.sort(key=lambda x: x['surprise_score'], reverse=True)
-        return surprising[:limit]
+        return surprising
@@ -5,29 +5,120 @@ Data ingestion module for processing markdown notes, PDFs, and saved links
 import re
 import json
 import csv
-import hashlib
+import os
+import multiprocessing
+import signal
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Dict, Any, Optional
-from datetime import datetime
 import logging
-import markdown
+from blake3 import blake3
 from io import StringIO, BytesIO
-import PyPDF2
+import pypdf
 import pdfplumber
 
+from .models import now_ms
+
 logger = logging.getLogger(__name__)
 
+# Common words that carry no topical meaning
+STOP_WORDS = frozenset({
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 
+    'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'being',
+    'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could',
+    'should', 'may', 'might', 'must', 'can', 'this', 'that', 'these',
+    'those', 'i', 'you', 'he', 'she', 'it', 'we', 'they', 'me', 'him',
+    'her', 'us', 'them', 'my', 'your', 'his', 'its', 'our', 'their'
+})
+
+# Title candidates: "# Heading" lines, or lines underlined with === / ---
+_TITLE_HEADING = re.compile(r'^#\s+(.+)$', re.MULTILINE)
+_TITLE_UNDERLINE = re.compile(r'^(.+)\n[=\-]+$', re.MULTILINE)
+
+# Runs of whitespace, collapsed to a single space
+_WHITESPACE = re.compile(r'\s+')
+
+# PDF text cleanup
+_PDF_ARTIFACT = re.compile(r'[^\w\s.,!?;:()\-\'"]+')
+_DIGIT = re.compile(r'\d')
+
+# Markdown syntax stripped by _markdown_to_text, applied in this order
+_MD_FENCE = re.compile(r'^\s{0,3}(?:```|~~~).*$', re.MULTILINE)  # Fence lines only, code is kept
+_MD_IMAGE = re.compile(r'!\[[^\]]*\]\([^)]*\)')
+_MD_LINK = re.compile(r'\[([^\]]*)\]\([^)]*\)')
+_MD_HTML_TAG = re.compile(r'<[^>]+>')
+_MD_RULE = re.compile(r'^\s{0,3}([-*_=])(?:\s*\1){2,}\s*$', re.MULTILINE)  # Also setext underlines
+_MD_BLOCK_PREFIX = re.compile(r'^\s*(?:#{1,6}\s+|>\s?|[-*+]\s+|\d+[.)]\s+)', re.MULTILINE)
+# Emphasis/code markers hugging a word; spares `a * b` and snake_case
+_MD_EMPHASIS = re.compile(r'(?<!\w)[*_~`]+(?=\w)|(?<=\w)[*_~`]+(?!\w)')
+
+# Any non-word, non-space character (punctuation, symbols, bullets), split on
+# in keyword extraction; '_' is kept since it counts as a word character
+_NON_WORD = re.compile(r'[^\w\s]')
+
+# Batches with more files than these are spread across a process pool; below
+# them, dispatch costs more than it saves (markdown parses quickly)
+PARALLEL_PDF_MIN_FILES = 4
+PARALLEL_MARKDOWN_MIN_FILES = 50
+
+def _ignore_sigint():
+    """Pool worker initializer: leave Ctrl+C to the server, which shuts the pool down"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def _process_markdown_worker(md_file: Dict) -> List[Dict]:
+    """Process pool entry point for one markdown file"""
+    return DataIngestion()._process_markdown_file(md_file)
+
+def _process_pdf_worker(pdf_file: Dict) -> List[Dict]:
+    """Process pool entry point for one PDF file"""
+    return DataIngestion()._process_pdf_file(pdf_file)
+
 class DataIngestion:
     """Handles ingestion and processing of various data sources"""
     
     def __init__(self):
         self.processed_items = []
+        # Started on first large batch and reused until close()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+    
+    def close(self):
+        """Shut down the process pool, if one was started"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+    
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """The shared process pool, created on first use"""
+        with self._pool_lock:
+            if self._pool is None:
+                # Spawn rather than fork: the server process runs request
+                # threads and torch/OpenMP thread pools, and forking while
+                # threads are live can deadlock the child
+                self._pool = ProcessPoolExecutor(
+                    max_workers=os.cpu_count() or 1,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_ignore_sigint
+                )
+            return self._pool
+    
+    def _map_files(self, worker, process_file, files: List[Dict], parallel: bool) -> List[Dict]:
+        """
+        Process files with the module-level worker in the process pool if
+        parallel, otherwise with this instance's process_file, and flatten
+        the results in input order
+        """
+        results = self._get_pool().map(worker, files) if parallel else map(process_file, files)
+        return [item for items in results for item in items]
     
     def process_data(self, markdown_data: List[Dict] = None, links_data: Any = None, pdf_data: List[Dict] = None) -> List[Dict]:
         """
         Process all data sources and return unified item list
         
         Args:
-            markdown_data: List of markdown files with filename and content
+            markdown_data: List of markdown files with filename and content (as bytes)
             links_data: JSON/CSV data containing saved links
             pdf_data: List of PDF files with filename and content
             
@@ -38,15 +129,18 @@ class DataIngestion:
         
         # Process markdown files
         if markdown_data:
-            for md_file in markdown_data:
-                items = self._process_markdown_file(md_file)
-                processed_items.extend(items)
+            processed_items.extend(self._map_files(
+                _process_markdown_worker, self._process_markdown_file, markdown_data,
+                parallel=len(markdown_data) > PARALLEL_MARKDOWN_MIN_FILES
+            ))
         
-        # Process PDF files
+        # Process PDF files; text extraction is CPU-bound pure Python, so
+        # files are spread across processes rather than threads
         if pdf_data:
-            for pdf_file in pdf_data:
-                items = self._process_pdf_file(pdf_file)
-                processed_items.extend(items)
+            processed_items.extend(self._map_files(
+                _process_pdf_worker, self._process_pdf_file, pdf_data,
+                parallel=len(pdf_data) > PARALLEL_PDF_MIN_FILES
+            ))
         
         # Process links data
         if links_data:
@@ -62,18 +156,21 @@ class DataIngestion:
         Extract structured data from a markdown file
         
         Args:
-            md_file: Dict with 'filename' and 'content' keys
+            md_file: Dict with 'filename' and 'content' keys (content as bytes)
             
         Returns:
             List of processed items from the markdown file
         """
         filename = md_file['filename']
-        content = md_file['content']
+        content_bytes = md_file['content']
         
         # Generate unique ID based on filename and content hash
-        content_hash = hashlib.md5(content.encode()).hexdigest()[:8]
+        content_hash = blake3(content_bytes).hexdigest(length=4)
         item_id = f"md_{filename}_{content_hash}"
         
+        # Decode once, only now that we need text
+        content = content_bytes.decode('utf-8', 'replace')
+        
         # Extract title (first heading or filename)
         title = self._extract_title_from_markdown(content) or filename
         
@@ -95,7 +192,7 @@ class DataIngestion:
             'keywords': keywords,
             'source_file': filename,
             'raw_content': content,  # Keep original markdown
-            'created_at': datetime.now()
+            'created_at_ms': now_ms()
         }
         
         logger.info(f"Processed markdown file: {filename} -> {title}")
@@ -122,7 +219,7 @@ class DataIngestion:
             return []
         
         # Generate unique ID based on filename and content hash
-        content_hash = hashlib.md5(content_bytes).hexdigest()[:8]
+        content_hash = blake3(content_bytes).hexdigest(length=4)
         item_id = f"pdf_{filename}_{content_hash}"
         
         # Extract title (try to get from first line or use filename)
@@ -142,7 +239,7 @@ class DataIngestion:
             'node_type': 'pdf',
             'keywords': keywords,
             'source_file': filename,
-            'created_at': datetime.now()
+            'created_at_ms': now_ms()
         }
         
         logger.info(f"Processed PDF file: {filename} -> {title} ({len(extracted_text)} chars)")
@@ -229,7 +326,7 @@ class DataIngestion:
         keywords = list(set(keywords))  # Remove duplicates
         
         # Generate unique ID
-        url_hash = hashlib.md5(url.encode()).hexdigest()[:8]
+        url_hash = blake3(url.encode()).hexdigest(length=4)
         item_id = f"link_{url_hash}"
         
         # Create snippet
@@ -246,7 +343,7 @@ class DataIngestion:
             'url': url,
             'description': description,
             'tags': tags,
-            'created_at': datetime.now()
+            'created_at_ms': now_ms()
         }
         
         return item
@@ -254,31 +351,28 @@ class DataIngestion:
     def _extract_title_from_markdown(self, content: str) -> Optional[str]:
         """Extract the first heading from markdown content"""
         # Look for # heading
-        heading_match = re.search(r'^#\s+(.+)$', content, re.MULTILINE)
+        heading_match = _TITLE_HEADING.search(content)
         if heading_match:
             return heading_match.group(1).strip()
         
         # Look for === or --- underlined headings
-        underline_match = re.search(r'^(.+)\n[=\-]+$', content, re.MULTILINE)
+        underline_match = _TITLE_UNDERLINE.search(content)
         if underline_match:
             return underline_match.group(1).strip()
         
         return None
     
     def _markdown_to_text(self, md_content: str) -> str:
-        """Convert markdown to plain text"""
-        try:
-            # Use markdown library to convert to HTML, then strip tags
-            html = markdown.markdown(md_content)
-            # Simple tag removal (for basic HTML)
-            text = re.sub(r'<[^>]+>', '', html)
-            # Clean up extra whitespace
-            text = re.sub(r'\s+', ' ', text).strip()
-            return text
-        except Exception:
-            # Fallback: simple markdown removal
-            text = re.sub(r'[#*`_\[\]()]+', '', md_content)
-            return re.sub(r'\s+', ' ', text).strip()
+        """Convert markdown to plain text by stripping its syntax"""
+        text = _MD_FENCE.sub('', md_content)
+        text = _MD_IMAGE.sub('', text)
+        text = _MD_LINK.sub(r'\1', text)
+        text = _MD_HTML_TAG.sub('', text)
+        text = _MD_RULE.sub('', text)
+        text = _MD_BLOCK_PREFIX.sub('', text)
+        text = _MD_EMPHASIS.sub('', text)
+        # Clean up extra whitespace
+        return _WHITESPACE.sub(' ', text).strip()
     
     def _extract_keywords(self, text: str, max_keywords: int = 10) -> List[str]:
         """
@@ -294,35 +388,17 @@ class DataIngestion:
         if not text:
             return []
         
-        # Convert to lowercase and remove special characters
-        clean_text = re.sub(r'[^\w\s]', ' ', text.lower())
-        
-        # Split into words
-        words = clean_text.split()
-        
-        # Filter out common stop words and short words
-        stop_words = {
-            'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 
-            'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'being',
-            'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could',
-            'should', 'may', 'might', 'must', 'can', 'this', 'that', 'these',
-            'those', 'i', 'you', 'he', 'she', 'it', 'we', 'they', 'me', 'him',
-            'her', 'us', 'them', 'my', 'your', 'his', 'her', 'its', 'our', 'their'
-        }
-        
-        # Filter and count words
-        word_freq = {}
-        for word in words:
-            if (len(word) > 2 and 
-                word not in stop_words and 
-                not word.isdigit()):
-                word_freq[word] = word_freq.get(word, 0) + 1
+        # Convert to lowercase, turn special characters into spaces and split
+        words = _NON_WORD.sub(' ', text.lower()).split()
         
-        # Sort by frequency and return top keywords
-        sorted_words = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)
-        keywords = [word for word, freq in sorted_words[:max_keywords]]
+        # Count words, skipping stop words, short words and numbers
+        word_freq = Counter(
+            word for word in words
+            if len(word) > 2 and word not in STOP_WORDS and not word.isdigit()
+        )
         
-        return keywords
+        # Return the most frequent words
+        return [word for word, freq in word_freq.most_common(max_keywords)]
     
     def _extract_text_from_pdf(self, content_bytes: bytes) -> str:
         """
@@ -335,48 +411,46 @@ class DataIngestion:
             Extracted text string
         """
         extracted_text = ""
+        min_chars = 50
         
         try:
-            # Method 1: Try pdfplumber first (better for complex layouts)
-            with pdfplumber.open(BytesIO(content_bytes)) as pdf:
-                text_parts = []
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text_parts.append(page_text)
-                
-                if text_parts:
-                    extracted_text = "\n\n".join(text_parts)
-                    logger.debug(f"Extracted {len(extracted_text)} chars using pdfplumber")
-        
+            # Method 1: pypdf first, cheap and enough for text-native PDFs
+            pdf_reader = pypdf.PdfReader(BytesIO(content_bytes))
+            extracted_text = "\n\n".join(
+                page_text for page_text in (page.extract_text() for page in pdf_reader.pages) if page_text
+            )
+            # Expect at least a little text per page from a text-native PDF
+            min_chars = max(50, 20 * len(pdf_reader.pages))
+            logger.debug(f"Extracted {len(extracted_text)} chars using pypdf")
         except Exception as e:
-            logger.debug(f"pdfplumber failed: {e}, trying PyPDF2...")
-            
+            logger.debug(f"pypdf failed: {e}, trying pdfplumber...")
+        
+        if len(extracted_text.strip()) < min_chars:
             try:
-                # Method 2: Fallback to PyPDF2
-                pdf_reader = PyPDF2.PdfReader(BytesIO(content_bytes))
-                text_parts = []
-                
-                for page_num in range(len(pdf_reader.pages)):
-                    page = pdf_reader.pages[page_num]
-                    page_text = page.extract_text()
-                    if page_text:
-                        text_parts.append(page_text)
+                # Method 2: pdfplumber for complex layouts pypdf reads poorly
+                with pdfplumber.open(BytesIO(content_bytes)) as pdf:
+                    text_parts = []
+                    for page in pdf.pages:
+                        page_text = page.extract_text()
+                        if page_text:
+                            text_parts.append(page_text)
                 
-                if text_parts:
-                    extracted_text = "\n\n".join(text_parts)
-                    logger.debug(f"Extracted {len(extracted_text)} chars using PyPDF2")
+                plumber_text = "\n\n".join(text_parts)
+                if len(plumber_text.strip()) > len(extracted_text.strip()):
+                    extracted_text = plumber_text
+                    logger.debug(f"Extracted {len(extracted_text)} chars using pdfplumber")
             
             except Exception as e2:
-                logger.error(f"Both PDF extraction methods failed: {e2}")
-                return ""
+                if not extracted_text:
+                    logger.error(f"Both PDF extraction methods failed: {e2}")
+                    return ""
         
         # Clean up the extracted text
         if extracted_text:
             # Remove excessive whitespace
-            extracted_text = re.sub(r'\s+', ' ', extracted_text)
+            extracted_text = _WHITESPACE.sub(' ', extracted_text)
             # Remove common PDF artifacts
-            extracted_text = re.sub(r'[^\w\s.,!?;:()\-\'"]+', ' ', extracted_text)
+            extracted_text = _PDF_ARTIFACT.sub(' ', extracted_text)
             extracted_text = extracted_text.strip()
         
         return extracted_text
@@ -407,7 +481,7 @@ class DataIngestion:
                 # Skip lines that are all caps (likely headers)
                 if not line.isupper():
                     # Skip lines with lots of numbers (likely page numbers, dates)
-                    if len(re.findall(r'\d', line)) < len(line) * 0.3:
+                    if len(_DIGIT.findall(line)) < len(line) * 0.3:
                         return line
         
         # Fallback: use first substantial line
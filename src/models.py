@@ -2,44 +2,103 @@
 Pydantic models for API request/response schemas
 """
 
-from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
-from datetime import datetime
+import time
+import msgspec
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
+from typing import List, Dict, Any, Optional, Sequence, Tuple
 
-class NodeData(BaseModel):
+def now_ms() -> int:
+    """Current time as integer Unix epoch milliseconds, the API's timestamp format"""
+    return time.time_ns() // 1_000_000
+
+class GraphModel(BaseModel):
+    """Base for graph payloads, which the server also builds from its own state"""
+    
+    # Immutable and closed: no per-instance extras dict, no assignment checks
+    model_config = ConfigDict(frozen=True, extra='forbid')
+    
+    @classmethod
+    def trusted(cls, **data: Any):
+        """
+        Build an instance from data the server produced itself, skipping validation
+        
+        Only for values already known to match the schema (e.g. derived from
+        the in-memory graph); anything from a request or an upload is validated
+        through the normal constructor.
+        """
+        return cls.model_construct(_fields_set=set(data), **data)
+
+class NodeData(GraphModel):
     """Represents a single node in the knowledge graph"""
     id: str = Field(..., description="Unique identifier for the node")
     title: str = Field(..., description="Display title of the node")
     content: str = Field(..., description="Full text content")
     node_type: str = Field(..., description="Type of node (note, link, etc.)")
-    keywords: List[str] = Field(default=[], description="Extracted keywords")
-    created_at: datetime = Field(default_factory=datetime.now)
+    keywords: Tuple[str, ...] = Field(default=(), description="Extracted keywords")
+    created_at_ms: int = Field(default_factory=now_ms, description="Creation time (Unix epoch ms)")
     click_count: int = Field(default=0, description="Number of times user clicked this node")
     source_file: Optional[str] = Field(None, description="Original source file name")
 
-class EdgeData(BaseModel):
+class EdgeData(GraphModel):
     """Represents an edge (connection) between nodes"""
     source: str = Field(..., description="Source node ID")
     target: str = Field(..., description="Target node ID")
     weight: float = Field(..., description="Connection strength (0.0 to 1.0)")
     similarity_type: str = Field(default="semantic", description="Type of similarity")
-    created_at: datetime = Field(default_factory=datetime.now)
+    created_at_ms: int = Field(default_factory=now_ms, description="Creation time (Unix epoch ms)")
     user_boosted: bool = Field(default=False, description="Whether user interaction boosted this edge")
 
 class GraphResponse(BaseModel):
     """Complete graph data response"""
-    nodes: List[NodeData] = Field(..., description="All nodes in the graph")
-    edges: List[EdgeData] = Field(..., description="All edges in the graph")
+    nodes: Sequence[NodeData] = Field(..., description="All nodes in the graph")
+    edges: Sequence[EdgeData] = Field(..., description="All edges in the graph")
     total_nodes: int = Field(..., description="Total number of nodes")
     total_edges: int = Field(..., description="Total number of edges")
-    last_updated: datetime = Field(default_factory=datetime.now)
+    last_updated_ms: int = Field(default_factory=now_ms, description="Response time (Unix epoch ms)")
+
+# Validators for bulk node/edge lists, built once and reused (e.g. to check
+# the nodes and edges of a /graph response without a full GraphResponse)
+NODES_ADAPTER = TypeAdapter(List[NodeData])
+EDGES_ADAPTER = TypeAdapter(List[EdgeData])
+
+# msgspec mirrors of the graph payload models. /graph encodes these
+# directly, since the server builds the response from its own state and it
+# needs no validation on the way out
+
+class NodeStruct(msgspec.Struct, gc=False):
+    """msgspec mirror of NodeData"""
+    id: str
+    title: str
+    content: str
+    node_type: str
+    keywords: Tuple[str, ...] = ()
+    created_at_ms: int = msgspec.field(default_factory=now_ms)
+    click_count: int = 0
+    source_file: Optional[str] = None
+
+class EdgeStruct(msgspec.Struct, gc=False):
+    """msgspec mirror of EdgeData"""
+    source: str
+    target: str
+    weight: float
+    similarity_type: str = "semantic"
+    created_at_ms: int = msgspec.field(default_factory=now_ms)
+    user_boosted: bool = False
+
+class GraphStruct(msgspec.Struct, gc=False):
+    """msgspec mirror of GraphResponse"""
+    nodes: List[NodeStruct]
+    edges: List[EdgeStruct]
+    total_nodes: int
+    total_edges: int
+    last_updated_ms: int = msgspec.field(default_factory=now_ms)
 
 class FeedbackRequest(BaseModel):
     """User feedback for adaptive learning"""
     node_id: str = Field(..., description="ID of the clicked/interacted node")
     interaction_type: str = Field(default="click", description="Type of interaction")
     duration: Optional[float] = Field(None, description="Time spent on node (seconds)")
-    timestamp: datetime = Field(default_factory=datetime.now)
+    timestamp_ms: int = Field(default_factory=now_ms, description="Interaction time (Unix epoch ms)")
 
 class IngestResponse(BaseModel):
     """Response from data ingestion endpoint"""
@@ -7,23 +7,45 @@ import sys
 import os
 
 def main():
-    """Start the FastAPI server with optimal settings"""
+    """
+    Start the FastAPI server with optimal settings
+    
+    This is the only launcher (`python main.py` calls it too). It uses the
+    development profile unless DEV=0: one auto-reloading process.
+    """
+    dev = os.getenv("DEV", "1") not in ("", "0")
+    
     print(" Starting Adaptive Personal Knowledge Graph API...")
     print(" Server will be available at: http://localhost:8000")
     print(" API Documentation: http://localhost:8000/docs")
-    print(" Auto-reload enabled for development")
+    if dev:
+        print(" Auto-reload enabled for development")
     print("\nPress Ctrl+C to stop the server\n")
     print("TIP: Tip: Use 'py' instead of 'python' on Windows!")
     
-    try:
-        uvicorn.run(
-            "main:app",
-            host="0.0.0.0",
-            port=8000,
-            reload=True,
-            log_level="info",
-            access_log=True
+    # libuv event loop and C HTTP parser, both installed by uvicorn[standard]
+    # (uvloop does not support Windows, which keeps the asyncio loop)
+    server_options = {
+        "host": "0.0.0.0",
+        "port": 8000,
+        "loop": "asyncio" if sys.platform == "win32" else "uvloop",
+        "http": "httptools"
+    }
+    if dev:
+        # Reload watches files from a single process, so no extra workers
+        server_options.update(reload=True, workers=1, log_level="info", access_log=True)
+    else:
+        # Each worker keeps its own in-memory graph (see README); per-request
+        # access lines and info logs are skipped outside development
+        server_options.update(
+            reload=False,
+            workers=int(os.getenv("WORKERS", "1")),
+            log_level="warning",
+            access_log=False
         )
+    
+    try:
+        uvicorn.run("main:app", **server_options)
     except KeyboardInterrupt:
         print("\n Server stopped gracefully")
     except Exception as e:
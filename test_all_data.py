@@ -2,11 +2,48 @@
 Test script to ingest ALL data types including PDF
 """
 
+from collections import Counter
+from contextlib import ExitStack
+from functools import lru_cache
+import orjson
 import requests
+from requests_toolbelt.multipart.encoder import MultipartEncoder
 from pathlib import Path
+import os
+import sys
+
+from api_client import make_session
 
 API_BASE = "http://localhost:8000"
 
+SESSION = make_session()
+
+TEST_DATA_DIR = Path("test_data")
+
+# Display marker for each node type
+EMOJI = {'note': "📝", 'pdf': "📄", 'link': "🔗"}
+
+@lru_cache(maxsize=None)
+def list_test_data():
+    """
+    List test_data/ once per run, grouped by lowercase file suffix
+    
+    Returns:
+        Dict mapping suffix (e.g. '.md') to a name-sorted tuple of paths;
+        empty if the folder does not exist
+    """
+    found = {}
+    try:
+        # scandir's entries carry their file type, so no extra stat per file
+        with os.scandir(TEST_DATA_DIR) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    suffix = os.path.splitext(entry.name)[1].lower()
+                    found.setdefault(suffix, []).append(Path(entry.path))
+    except FileNotFoundError:
+        pass
+    return {suffix: tuple(sorted(paths)) for suffix, paths in found.items()}
+
 def test_comprehensive_ingestion():
     """
     Test ingestion of all data types together
@@ -14,52 +51,50 @@ def test_comprehensive_ingestion():
     print(" Testing comprehensive data ingestion (Markdown + PDF + Links)")
     
     try:
-        # Prepare all files for upload
-        files = []
-        file_handles = []
-        
-        # Add markdown files
-        test_data_dir = Path("test_data")
-        md_files = list(test_data_dir.glob("*.md"))
-        print(f"Found {len(md_files)} markdown files:")
-        for md_file in md_files:
-            print(f"  • {md_file.name}")
-            fh = open(md_file, 'rb')
-            file_handles.append(fh)
-            files.append(('markdown_files', (md_file.name, fh, 'text/markdown')))
-        
-        # Add PDF files
-        pdf_files = list(test_data_dir.glob("*.pdf"))
-        if pdf_files:
-            print(f"Found {len(pdf_files)} PDF files:")
-            for pdf_file in pdf_files:
-                print(f"  • {pdf_file.name}")
-                fh = open(pdf_file, 'rb')
-                file_handles.append(fh)
-                files.append(('pdf_files', (pdf_file.name, fh, 'application/pdf')))
-        else:
-            print("No PDF files found in test_data/")
-        
-        # Add links JSON
-        links_file = test_data_dir / "saved_links.json"
-        if links_file.exists():
-            print(f"Found links file: {links_file.name}")
-            fh = open(links_file, 'rb')
-            file_handles.append(fh)
-            files.append(('links_file', (links_file.name, fh, 'application/json')))
-        
-        # Make the request
-        print(f"\n🔄 Uploading {len(files)} files...")
-        response = requests.post(f"{API_BASE}/ingest", files=files)
-        
-        # Close all files
-        for fh in file_handles:
-            fh.close()
+        # Every opened file is closed when the upload finishes or fails
+        with ExitStack() as stack:
+            files = []
+            
+            # Add markdown files
+            md_files = list_test_data().get('.md', ())
+            print(f"Found {len(md_files)} markdown files:")
+            for md_file in md_files:
+                print(f"  • {md_file.name}")
+                fh = stack.enter_context(open(md_file, 'rb'))
+                files.append(('markdown_files', (md_file.name, fh, 'text/markdown')))
+            
+            # Add PDF files
+            pdf_files = list_test_data().get('.pdf', ())
+            if pdf_files:
+                print(f"Found {len(pdf_files)} PDF files:")
+                for pdf_file in pdf_files:
+                    print(f"  • {pdf_file.name}")
+                    fh = stack.enter_context(open(pdf_file, 'rb'))
+                    files.append(('pdf_files', (pdf_file.name, fh, 'application/pdf')))
+            else:
+                print("No PDF files found in test_data/")
+            
+            # Add links JSON
+            links_file = TEST_DATA_DIR / "saved_links.json"
+            if links_file.exists():
+                print(f"Found links file: {links_file.name}")
+                fh = stack.enter_context(open(links_file, 'rb'))
+                files.append(('links_file', (links_file.name, fh, 'application/json')))
+            
+            # Stream the multipart body, reading each file in chunks as the
+            # socket accepts them instead of buffering the whole upload
+            encoder = MultipartEncoder(files)
+            print(f"\n🔄 Uploading {len(files)} files...")
+            response = SESSION.post(
+                f"{API_BASE}/ingest",
+                data=encoder,
+                headers={'Content-Type': encoder.content_type}
+            )
         
         print(f"Status: {response.status_code}")
         
         if response.status_code == 200:
-            result = response.json()
+            result = orjson.loads(response.content)
             print(f"SUCCESS: Success! Processed {result['items_processed']} items")
             print(f"   📝 Created {result['nodes_created']} nodes")
             print(f"   🔗 Generated {result['edges_created']} connections")
@@ -75,35 +110,37 @@ def test_comprehensive_ingestion():
 def get_detailed_graph_info():
     """Get detailed graph information"""
     try:
-        response = requests.get(f"{API_BASE}/graph")
+        response = SESSION.get(f"{API_BASE}/graph")
         if response.status_code == 200:
-            graph_data = response.json()
-            print(f"\n Complete Graph Analysis:")
-            print(f"   Total nodes: {graph_data['total_nodes']}")
-            print(f"   Total edges: {graph_data['total_edges']}")
+            graph_data = orjson.loads(response.content)
+            
+            # Collect the report and write it in one go rather than a
+            # print (and stdout write) per line
+            lines = [
+                f"\n Complete Graph Analysis:",
+                f"   Total nodes: {graph_data['total_nodes']}",
+                f"   Total edges: {graph_data['total_edges']}"
+            ]
             
             # Count node types
-            node_types = {}
-            for node in graph_data['nodes']:
-                node_type = node['node_type']
-                node_types[node_type] = node_types.get(node_type, 0) + 1
+            node_types = Counter(node['node_type'] for node in graph_data['nodes'])
             
-            print(f"\n📋 Node Types:")
+            lines.append(f"\n📋 Node Types:")
             for node_type, count in node_types.items():
-                emoji = "📝" if node_type == 'note' else "📄" if node_type == 'pdf' else "🔗"
-                print(f"   {emoji} {node_type.title()}: {count}")
+                lines.append(f"   {EMOJI.get(node_type, '•')} {node_type.title()}: {count}")
             
             # Show all nodes by type
             for node_type in ['note', 'pdf', 'link']:
                 nodes = [n for n in graph_data['nodes'] if n['node_type'] == node_type]
                 if nodes:
-                    emoji = "📝" if node_type == 'note' else "📄" if node_type == 'pdf' else "🔗"
-                    print(f"\n{emoji} {node_type.title()} Documents:")
+                    lines.append(f"\n{EMOJI[node_type]} {node_type.title()} Documents:")
                     for node in nodes:
-                        print(f"   • {node['title']}")
+                        lines.append(f"   • {node['title']}")
                         if node['keywords']:
                             keywords = ', '.join(node['keywords'][:4])
-                            print(f"     Keywords: {keywords}")
+                            lines.append(f"     Keywords: {keywords}")
+            
+            sys.stdout.write("\n".join(lines) + "\n")
             
         else:
             print(f"ERROR: Error getting graph info: {response.text}")
@@ -118,7 +155,7 @@ def main():
     
     # Test server connection
     try:
-        response = requests.get(f"{API_BASE}/")
+        response = SESSION.get(f"{API_BASE}/")
         if response.status_code != 200:
             raise requests.exceptions.ConnectionError()
         print("SUCCESS: Server is running\n")
@@ -2,19 +2,25 @@
 Simple test script to demonstrate the Knowledge Graph API
 """
 
+import orjson
 import requests
 import json
 import os
 from pathlib import Path
 
+from api_client import make_session
+from src.models import NODES_ADAPTER, EDGES_ADAPTER
+
 API_BASE = "http://localhost:8000"
 
+SESSION = make_session()
+
 def test_health_check():
     """Test the root endpoint"""
     print(" Testing health check...")
-    response = requests.get(f"{API_BASE}/")
+    response = SESSION.get(f"{API_BASE}/")
     print(f"Status: {response.status_code}")
-    print(f"Response: {response.json()}")
+    print(f"Response: {orjson.loads(response.content)}")
     print()
 
 def test_ingest_data():
@@ -41,7 +47,7 @@ def test_ingest_data():
     
     try:
         # Make the request
-        response = requests.post(f"{API_BASE}/ingest", files=files)
+        response = SESSION.post(f"{API_BASE}/ingest", files=files)
     finally:
         # Close all opened files
         for fh in file_handles:
@@ -49,7 +55,7 @@ def test_ingest_data():
     
     print(f"Status: {response.status_code}")
     if response.status_code == 200:
-        result = response.json()
+        result = orjson.loads(response.content)
         print(f"SUCCESS: Success! Processed {result['items_processed']} items")
         print(f"   Created {result['nodes_created']} nodes and {result['edges_created']} edges")
     else:
@@ -60,11 +66,15 @@ def test_get_graph():
     """Test retrieving the graph data"""
     print("🕸️ Testing graph retrieval...")
     
-    response = requests.get(f"{API_BASE}/graph")
+    response = SESSION.get(f"{API_BASE}/graph")
     print(f"Status: {response.status_code}")
     
     if response.status_code == 200:
-        graph_data = response.json()
+        graph_data = orjson.loads(response.content)
+        
+        # Check the payload against the API schema
+        NODES_ADAPTER.validate_python(graph_data['nodes'])
+        EDGES_ADAPTER.validate_python(graph_data['edges'])
         print(f"SUCCESS: Graph retrieved successfully!")
         print(f"   Nodes: {graph_data['total_nodes']}")
         print(f"   Edges: {graph_data['total_edges']}")
@@ -77,9 +87,10 @@ def test_get_graph():
         
         # Show some sample edges
         print("\n🔗 Sample edges:")
+        title_by_id = {n['id']: n['title'] for n in graph_data['nodes']}
         for i, edge in enumerate(graph_data['edges'][:3]):
-            source_title = next(n['title'] for n in graph_data['nodes'] if n['id'] == edge['source'])
-            target_title = next(n['title'] for n in graph_data['nodes'] if n['id'] == edge['target'])
+            source_title = title_by_id[edge['source']]
+            target_title = title_by_id[edge['target']]
             print(f"   {i+1}. {source_title} ↔ {target_title} (weight: {edge['weight']:.3f})")
         
         return graph_data
@@ -105,11 +116,15 @@ def test_feedback(graph_data):
         "duration": 15.5
     }
     
-    response = requests.post(f"{API_BASE}/feedback", json=feedback_data)
+    response = SESSION.post(
+        f"{API_BASE}/feedback",
+        data=orjson.dumps(feedback_data),
+        headers={"Content-Type": "application/json"}
+    )
     print(f"Status: {response.status_code}")
     
     if response.status_code == 200:
-        result = response.json()
+        result = orjson.loads(response.content)
         print(f"SUCCESS: Feedback recorded for: {test_node['title']}")
         print(f"   Updated {len(result['updated_connections'])} connections")
     else:
@@ -120,11 +135,11 @@ def test_stats():
     """Test graph statistics"""
     print(" Testing graph statistics...")
     
-    response = requests.get(f"{API_BASE}/stats")
+    response = SESSION.get(f"{API_BASE}/stats")
     print(f"Status: {response.status_code}")
     
     if response.status_code == 200:
-        stats = response.json()
+        stats = orjson.loads(response.content)
         print("SUCCESS: Statistics retrieved:")
         print(f"   Total nodes: {stats['total_nodes']}")
         print(f"   Total edges: {stats['total_edges']}")
@@ -2,11 +2,18 @@
 Test script for PDF ingestion into the Knowledge Graph
 """
 
+from collections import Counter
+import orjson
 import requests
+from requests_toolbelt.multipart.encoder import MultipartEncoder
 from pathlib import Path
 
+from api_client import make_session
+
 API_BASE = "http://localhost:8000"
 
+SESSION = make_session()
+
 def test_pdf_ingestion(pdf_path: str):
     """
     Test PDF file ingestion
@@ -22,17 +29,21 @@ def test_pdf_ingestion(pdf_path: str):
         return False
     
     try:
-        # Prepare the PDF file for upload
+        # Stream the PDF from disk in chunks instead of buffering it
         with open(pdf_file, 'rb') as f:
-            files = [('pdf_files', (pdf_file.name, f, 'application/pdf'))]
+            encoder = MultipartEncoder([('pdf_files', (pdf_file.name, f, 'application/pdf'))])
             
             # Make the request
-            response = requests.post(f"{API_BASE}/ingest", files=files)
+            response = SESSION.post(
+                f"{API_BASE}/ingest",
+                data=encoder,
+                headers={'Content-Type': encoder.content_type}
+            )
         
         print(f"Status: {response.status_code}")
         
         if response.status_code == 200:
-            result = response.json()
+            result = orjson.loads(response.content)
             print(f"SUCCESS: Success! Processed {result['items_processed']} items")
             print(f"   📝 Created {result['nodes_created']} nodes")
             print(f"   🔗 Generated {result['edges_created']} connections")
@@ -48,18 +59,15 @@ def test_pdf_ingestion(pdf_path: str):
 def get_graph_info():
     """Get current graph information"""
     try:
-        response = requests.get(f"{API_BASE}/graph")
+        response = SESSION.get(f"{API_BASE}/graph")
         if response.status_code == 200:
-            graph_data = response.json()
+            graph_data = orjson.loads(response.content)
             print(f"\n Current Graph Status:")
             print(f"   Total nodes: {graph_data['total_nodes']}")
             print(f"   Total edges: {graph_data['total_edges']}")
             
             # Count node types
-            node_types = {}
-            for node in graph_data['nodes']:
-                node_type = node['node_type']
-                node_types[node_type] = node_types.get(node_type, 0) + 1
+            node_types = Counter(node['node_type'] for node in graph_data['nodes'])
             
             print(f"   Node types: {dict(node_types)}")
             
@@ -84,7 +92,7 @@ def main():
     
     # Test server connection
     try:
-        response = requests.get(f"{API_BASE}/")
+        response = SESSION.get(f"{API_BASE}/")
         if response.status_code != 200:
             raise requests.exceptions.ConnectionError()
         print("SUCCESS: Server is running\n")